@@ -7,50 +7,68 @@ from typing import Dict, Any
 
 # API Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+OPENAI_BATCH_POLL_INTERVAL = 30  # seconds between Batch API status checks
 OLLAMA_BASE_URL = "http://localhost:11434"
 
 # File paths
 GROUND_TRUTH_FILE = "framework_methods_ground_truth.json"
 OUTPUT_DIR = "evaluation_results"
+RESPONSE_CACHE_FILE = "llm_response_cache.sqlite"  # exact-match LLM response cache, reused across runs
+EMBEDDING_CACHE_FILE = "embedding_cache.npz"  # sentence embeddings by text, reused across runs
+
+# All Ollama models share one local server; running several at once makes it swap weights
+OLLAMA_MAX_CONCURRENT_PER_MODEL = 1  # requests in flight per Ollama model
+OLLAMA_MAX_CONCURRENT_TOTAL = 1      # requests in flight across all Ollama models
+OLLAMA_MODEL_BATCH_SIZE = 20         # consecutive methods sent to one Ollama model before switching
 
 # LLM Configurations
+# requests_per_minute / tokens_per_minute: provider budget (omit for no limit)
+# max_concurrent: requests in flight at once
 LLM_CONFIGS = {
     "gpt4o": {
         "type": "openai",
         "model": "gpt-4o",
         "temperature": 0.1,
         "max_tokens": 1000,
-        "rate_limit_delay": 1  # seconds between requests
+        "requests_per_minute": 500,
+        "tokens_per_minute": 30000,
+        "max_concurrent": 8
     },
     "deepseek": {
         "type": "ollama", 
         "model": "deepseek-coder:6.7b",
         "temperature": 0.1,
-        "rate_limit_delay": 0.5
+        "max_concurrent": OLLAMA_MAX_CONCURRENT_PER_MODEL
     },
     "qwen": {
         "type": "ollama",
         "model": "qwen3-coder:latest", 
         "temperature": 0.1,
-        "rate_limit_delay": 0.5
+        "max_concurrent": OLLAMA_MAX_CONCURRENT_PER_MODEL
     },
     "codellama": {
         "type": "ollama",
         "model": "codellama:7b",
         "temperature": 0.1,
-        "rate_limit_delay": 0.5
+        "max_concurrent": OLLAMA_MAX_CONCURRENT_PER_MODEL
     },
     "llama3": {
         "type": "ollama",
         "model": "llama3.1:8b",
         "temperature": 0.1,
-        "rate_limit_delay": 0.5
+        "max_concurrent": OLLAMA_MAX_CONCURRENT_PER_MODEL
     }
 }
+LLM_NAMES = tuple(LLM_CONFIGS)
 
 # Evaluation settings
 MAX_RETRIES = 3
 SIMILARITY_THRESHOLD = 0.6
+SIMILARITY_BACKEND = "torch"  # "torch", "onnx" or "openvino" (needs sentence-transformers[onnx] / [openvino]); falls back to torch if the export cannot be loaded
+SIMILARITY_MODEL_FILE = "model.onnx"  # exported model file for the onnx/openvino backend; "model_O3.onnx" is faster but approximates GELU, shifting scores
+SIMILARITY_PROCESSES = 0  # CPU processes for large encodes with the torch backend (e.g. os.cpu_count()); 0 disables
+SIMILARITY_REDUCED_PRECISION = False  # FP16 model on CUDA and int8 embeddings for scoring; faster, near-lossless
 PROGRESS_SAVE_INTERVAL = 10  # Save progress every N methods
 
 # Prompt template
@@ -2,31 +2,49 @@
 Main evaluation framework for Android Framework Methods
 """
 
+import asyncio
+import orjson
+import os
 import time
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 from datetime import datetime
 
 from llm_interface import LLMInterface
 from utils import (
-    SimilarityCalculator, load_ground_truth, save_json,
-    calculate_method_similarity, count_total_methods,
-    get_method_list, create_progress_summary
+    SimilarityCalculator, load_ground_truth, load_progress_log, save_json,
+    calculate_similarities, precompute_ground_truth, _failed_similarity, count_total_methods,
+    get_method_list
+)
+from config import (
+    OUTPUT_DIR, PROGRESS_SAVE_INTERVAL, LLM_CONFIGS, LLM_NAMES, RESPONSE_CACHE_FILE, EMBEDDING_CACHE_FILE,
+    OLLAMA_MAX_CONCURRENT_TOTAL, OLLAMA_MODEL_BATCH_SIZE,
+    SIMILARITY_BACKEND, SIMILARITY_MODEL_FILE, SIMILARITY_PROCESSES, SIMILARITY_REDUCED_PRECISION
 )
-from config import OUTPUT_DIR, PROGRESS_SAVE_INTERVAL, LLM_CONFIGS
 
 logger = logging.getLogger(__name__)
 
 class FrameworkMethodEvaluator:
     """Main class for evaluating LLM performance on framework method understanding"""
     
-    def __init__(self, ground_truth_file: str, openai_api_key: str = None):
+    def __init__(self, ground_truth_file: str, openai_api_key: str = None,
+                 cache_file: Optional[str] = RESPONSE_CACHE_FILE,
+                 embedding_cache_file: Optional[str] = EMBEDDING_CACHE_FILE):
         self.ground_truth = load_ground_truth(ground_truth_file)
-        self.llm_interface = LLMInterface(openai_api_key)
-        self.similarity_calc = SimilarityCalculator()
+        self.llm_interface = LLMInterface(openai_api_key, cache_file=cache_file)
+        self.similarity_calc = SimilarityCalculator(reduced_precision=SIMILARITY_REDUCED_PRECISION,
+                                                    cache_file=embedding_cache_file,
+                                                    backend=SIMILARITY_BACKEND,
+                                                    model_file=SIMILARITY_MODEL_FILE,
+                                                    processes=SIMILARITY_PROCESSES)
+        self._gt_embeddings = None  # per-signature ground-truth embeddings, built on first scoring
         self.results = {}
         self.start_time = None
+        self._progress_log = None
+        self._scores_df = None  # long-form (method, LLM) scores, rebuilt when results change
+        self._summary_cache = None
+        self._categories = set()
         
         # Validate ground truth structure
         self._validate_ground_truth()
@@ -44,80 +62,153 @@ class FrameworkMethodEvaluator:
         
         logger.info(f"Ground truth validation passed: {total_methods} methods across {len(self.ground_truth['framework_methods'])} categories")
     
-    def run_full_evaluation(self, output_dir: str = OUTPUT_DIR, resume_from: str = None):
-        """Run complete evaluation of all methods across all LLMs"""
+    def run_full_evaluation(self, output_dir: str = OUTPUT_DIR, resume_from: str = None, batch_openai: bool = False):
+        """Run complete evaluation of all methods across all LLMs
+        
+        With batch_openai, OpenAI models answer the whole pass through the Batch API
+        and only the requests that fail there are retried through realtime queries.
+        """
+        asyncio.run(self._run_full_evaluation(output_dir, resume_from, batch_openai))
+    
+    async def _run_full_evaluation(self, output_dir: str, resume_from: str, batch_openai: bool):
+        """Evaluate all methods, scheduling (method, LLM) queries shortest prompt first"""
         self.start_time = time.time()
         
         # Load existing results if resuming
         if resume_from:
             try:
-                self.results = load_ground_truth(resume_from)
+                if resume_from.endswith(".jsonl"):
+                    self.results = load_progress_log(resume_from)
+                else:
+                    self.results = load_ground_truth(resume_from)
+                self._categories = {result["category"] for result in self.results.values()}
                 logger.info(f"Resumed from {resume_from}")
             except Exception as e:
                 logger.warning(f"Could not resume from {resume_from}: {e}")
         
         methods_list = get_method_list(self.ground_truth)
         total_methods = len(methods_list)
-        total_evaluations = total_methods * len(LLM_CONFIGS)
+        total_evaluations = total_methods * len(LLM_NAMES)
         
-        logger.info(f"Starting evaluation: {total_methods} methods × {len(LLM_CONFIGS)} LLMs = {total_evaluations} evaluations")
+        logger.info(f"Starting evaluation: {total_methods} methods × {len(LLM_NAMES)} LLMs = {total_evaluations} evaluations")
         
+        # Methods still to evaluate, with their partial results and outstanding LLM count
+        pending = {}
         for idx, method_info in enumerate(methods_list):
             signature = method_info["signature"]
-            category = method_info["category"]
-            method_data = method_info["data"]
             
             # Skip if already evaluated
-            if signature in self.results:
+            if signature in self.results or signature in pending:
                 logger.info(f"[{idx+1}/{total_methods}] Skipping {signature} (already evaluated)")
                 continue
             
-            logger.info(f"[{idx+1}/{total_methods}] Evaluating: {signature}")
-            
-            # Initialize result structure
-            self.results[signature] = {
-                "category": category,
-                "ground_truth": method_data,
-                "llm_responses": {},
-                "similarities": {},
-                "evaluation_timestamp": datetime.now().isoformat()
+            pending[signature] = {
+                "prompt": self.llm_interface.create_prompt(signature),
+                "remaining": len(LLM_NAMES),
+                "result": {
+                    "category": method_info["category"],
+                    "ground_truth": method_info["data"],
+                    "llm_responses": {},
+                    "similarities": {}
+                }
             }
+        
+        # Shortest-prompt-first. Each remote LLM gets its own queue so a slow model cannot
+        # hold up the others. The Ollama models share one local server, so they share one
+        # queue that sends each model a batch of methods in turn to keep its weights loaded.
+        shortest_first = sorted(pending, key=lambda signature: len(pending[signature]["prompt"]))
+        ollama_names = [llm_name for llm_name in LLM_NAMES if LLM_CONFIGS[llm_name]["type"] == "ollama"]
+        queues = []  # (queue of (llm_name, signature), worker count)
+        batch_llms = []  # (llm_name, realtime queue for the requests the batch job misses, worker count)
+        for llm_name in LLM_NAMES:
+            if llm_name not in ollama_names:
+                queue = asyncio.Queue()
+                worker_count = LLM_CONFIGS[llm_name].get("max_concurrent", 1)
+                if batch_openai and LLM_CONFIGS[llm_name]["type"] == "openai":
+                    batch_llms.append((llm_name, queue, worker_count))
+                    continue
+                for signature in shortest_first:
+                    queue.put_nowait((llm_name, signature))
+                queues.append((queue, worker_count))
+        if ollama_names:
+            queue = asyncio.Queue()
+            for start in range(0, len(shortest_first), OLLAMA_MODEL_BATCH_SIZE):
+                batch = shortest_first[start:start + OLLAMA_MODEL_BATCH_SIZE]
+                for llm_name in ollama_names:
+                    for signature in batch:
+                        queue.put_nowait((llm_name, signature))
+            queues.append((queue, OLLAMA_MAX_CONCURRENT_TOTAL))
+        
+        completed = total_methods - len(pending)
+        
+        def record(llm_name: str, signature: str, llm_result: Dict):
+            nonlocal completed
+            entry = pending[signature]
+            self._record_llm_result(entry["result"], llm_name, llm_result)
             
-            # Evaluate with each LLM
-            for llm_name in LLM_CONFIGS.keys():
-                logger.info(f"  → Querying {llm_name}")
+            entry["remaining"] -= 1
+            if entry["remaining"] == 0:
+                entry["result"]["evaluation_timestamp"] = datetime.now().isoformat()
+                self.results[signature] = entry["result"]
+                self._categories.add(entry["result"]["category"])
+                self._invalidate_summary()
+                self._log_progress(signature)
+                completed += 1
+                logger.info(f"[{completed}/{total_methods}] Completed: {signature}")
                 
-                try:
-                    # Query LLM
-                    llm_result = self.llm_interface.evaluate_method(signature, llm_name)
-                    self.results[signature]["llm_responses"][llm_name] = llm_result
-                    
-                    # Calculate similarity if successful
-                    if llm_result["success"]:
-                        similarity_scores = calculate_method_similarity(
-                            method_data, 
-                            llm_result["parsed_response"],
-                            self.similarity_calc
-                        )
-                        self.results[signature]["similarities"][llm_name] = similarity_scores
-                        
-                        # Log similarity score
-                        overall_sim = similarity_scores.get("overall_similarity", 0.0)
-                        logger.info(f"    → Overall similarity: {overall_sim:.3f}")
-                    else:
-                        logger.warning(f"    → Failed: {llm_result.get('error', 'Unknown error')}")
+                # Save progress periodically
+                if completed % PROGRESS_SAVE_INTERVAL == 0:
+                    self._save_progress(output_dir, completed, total_methods)
+        
+        async def worker(queue: asyncio.Queue):
+            while not queue.empty():
+                llm_name, signature = queue.get_nowait()
                 
+                try:
+                    llm_result = await self.llm_interface.evaluate_prompt(pending[signature]["prompt"], signature, llm_name)
                 except Exception as e:
-                    logger.error(f"    → Exception: {e}")
-                    self.results[signature]["llm_responses"][llm_name] = {
+                    logger.error(f"    → {llm_name} exception on {signature}: {e}")
+                    llm_result = {
                         "success": False,
                         "error": str(e),
                         "llm": llm_name
                     }
+                record(llm_name, signature, llm_result)
+        
+        async def batch_worker(llm_name: str, queue: asyncio.Queue, worker_count: int):
+            try:
+                batch_results = await self.llm_interface.evaluate_prompts_batch(
+                    {signature: pending[signature]["prompt"] for signature in shortest_first}, llm_name
+                )
+            except Exception as e:
+                logger.error(f"OpenAI batch for {llm_name} failed, falling back to realtime queries: {e}")
+                batch_results = {}
             
-            # Save progress periodically
-            if (idx + 1) % PROGRESS_SAVE_INTERVAL == 0:
-                self._save_progress(output_dir, idx + 1, total_methods)
+            for signature in shortest_first:
+                if signature in batch_results:
+                    record(llm_name, signature, batch_results[signature])
+                else:
+                    queue.put_nowait((llm_name, signature))
+            await asyncio.gather(*[worker(queue) for _ in range(worker_count)])
+        
+        self._open_progress_log(output_dir, resume_from)
+        await self.llm_interface.open()
+        try:
+            await asyncio.gather(
+                *[worker(queue) for queue, worker_count in queues for _ in range(worker_count)],
+                *[batch_worker(llm_name, queue, worker_count) for llm_name, queue, worker_count in batch_llms]
+            )
+        finally:
+            await self.llm_interface.close()
+            self._close_progress_log()
+        
+        # Responses are scored together once querying is done, including resumed ones
+        self._score_results()
+        
+        # Report in ground truth order regardless of completion order
+        method_order = {method_info["signature"]: i for i, method_info in enumerate(methods_list)}
+        self.results = dict(sorted(self.results.items(), key=lambda item: method_order.get(item[0], total_methods)))
+        self._invalidate_summary()
         
         # Save final results
         self._save_final_results(output_dir)
@@ -128,13 +219,85 @@ class FrameworkMethodEvaluator:
         
         logger.info(f"Evaluation complete! Results saved to {output_dir}/")
     
+    def _record_llm_result(self, result: Dict, llm_name: str, llm_result: Dict):
+        """Store one LLM response for a method; it is scored later by _score_results"""
+        result["llm_responses"][llm_name] = llm_result
+        
+        if not llm_result["success"]:
+            logger.warning(f"    → {llm_name} failed: {llm_result.get('error', 'Unknown error')}")
+    
+    def _score_results(self):
+        """Score every successful response that has no similarity yet, encoding them all in one pass"""
+        to_score = [
+            (result, llm_name)
+            for result in self.results.values()
+            for llm_name, llm_result in result["llm_responses"].items()
+            if llm_result["success"] and llm_name not in result["similarities"]
+        ]
+        if not to_score:
+            return
+        
+        try:
+            if self._gt_embeddings is None:
+                self._gt_embeddings = precompute_ground_truth(self.ground_truth, self.similarity_calc)
+            
+            logger.info(f"Calculating similarity for {len(to_score)} responses")
+            similarities = calculate_similarities(
+                [(result["ground_truth"], result["llm_responses"][llm_name]["parsed_response"]) for result, llm_name in to_score],
+                self.similarity_calc,
+                self._gt_embeddings
+            )
+        except Exception as e:
+            # Score what failed as 0.0 like calculate_similarities does, so the run's outputs are still written
+            failed = _failed_similarity(e)
+            similarities = [dict(failed) for _ in to_score]
+        finally:
+            # Both encodes above share one worker pool, if any was started
+            self.similarity_calc.close()
+        for (result, llm_name), similarity_scores in zip(to_score, similarities):
+            result["similarities"][llm_name] = similarity_scores
+        self._invalidate_summary()
+        self.similarity_calc.save_cache()
+    
+    def _open_progress_log(self, output_dir: str, resume_from: str = None):
+        """Open the append-only progress log, adding any resumed results it does not already hold"""
+        os.makedirs(output_dir, exist_ok=True)
+        log_path = f"{output_dir}/progress.jsonl"
+        # Never truncate: the previous run's checkpoints must survive a run started without,
+        # or failing to load, resume_from
+        needs_newline = False
+        if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+            logger.info(f"Appending to existing progress log {log_path}")
+            with open(log_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"  # a killed run can leave a partial last line
+        self._progress_log = open(log_path, "ab", buffering=1 << 20)
+        if needs_newline:
+            self._progress_log.write(b"\n")
+        
+        if resume_from and os.path.exists(resume_from) and os.path.samefile(resume_from, log_path):
+            return  # the resumed results are already in this log
+        for signature in self.results:
+            self._log_progress(signature)
+    
+    def _log_progress(self, signature: str):
+        """Append one completed method to the progress log"""
+        if self._progress_log is not None:
+            self._progress_log.write(orjson.dumps({signature: self.results[signature]}) + b"\n")
+    
+    def _close_progress_log(self):
+        if self._progress_log is not None:
+            self._progress_log.close()
+            self._progress_log = None
+    
     def _save_progress(self, output_dir: str, current_idx: int, total_methods: int):
-        """Save progress backup"""
-        progress_file = f"{output_dir}/progress_backup.json"
-        save_json(self.results, progress_file)
+        """Flush the buffered progress log to disk"""
+        if self._progress_log is not None:
+            self._progress_log.flush()
         
-        summary = create_progress_summary(self.results, total_methods)
-        logger.info(f"Progress saved: {summary['completed_methods']}/{total_methods} methods ({summary['progress_percentage']:.1f}%)")
+        # Only counts here: rescanning self.results at every checkpoint would make checkpoints O(results)
+        completed = len(self.results)
+        logger.info(f"Progress saved: {completed}/{total_methods} methods ({completed / total_methods * 100:.1f}%)")
     
     def _save_final_results(self, output_dir: str):
         """Save final evaluation results"""
@@ -142,151 +305,178 @@ class FrameworkMethodEvaluator:
         save_json(self.results, f"{output_dir}/full_results.json")
         
         # Summary statistics
-        summary = self._generate_summary_stats()
-        save_json(summary, f"{output_dir}/summary_statistics.json")
+        save_json(self._get_summary_stats(), f"{output_dir}/summary_statistics.json")
         
         logger.info("Final results saved")
     
+    def _invalidate_summary(self):
+        """Drop derived statistics after self.results changes"""
+        self._scores_df = None
+        self._summary_cache = None
+    
+    def _get_summary_stats(self) -> Dict:
+        """Summary statistics, computed once per set of results"""
+        if self._summary_cache is None:
+            self._summary_cache = self._generate_summary_stats()
+        return self._summary_cache
+    
+    def _scores_frame(self) -> pd.DataFrame:
+        """One row per (method, LLM): category, query success and overall similarity"""
+        if self._scores_df is None:
+            rows = []
+            nan = float("nan")
+            for result in self.results.values():
+                category = result["category"]
+                responses = result["llm_responses"]
+                similarities = result["similarities"]
+                for llm_name in LLM_NAMES:
+                    llm_response = responses.get(llm_name)
+                    similarity = similarities.get(llm_name)
+                    rows.append((
+                        category,
+                        llm_name,
+                        bool(llm_response and llm_response.get("success", False)),
+                        similarity["overall_similarity"] if similarity and similarity.get("success", False) else nan
+                    ))
+            self._scores_df = pd.DataFrame(rows, columns=["category", "llm", "success", "similarity"])
+        return self._scores_df
+    
     def _generate_summary_stats(self) -> Dict:
         """Generate summary statistics"""
-        stats = {
+        df = self._scores_frame()
+        llm_names = list(LLM_NAMES)
+        
+        success_rates = df.groupby("llm", sort=False)["success"].mean().reindex(llm_names, fill_value=0.0)
+        similarity_averages = (df[df["success"]].groupby("llm", sort=False)["similarity"].mean()
+                               .reindex(llm_names).fillna(0.0))
+        category_performance = (df.groupby(["category", "llm"], sort=False)["similarity"].mean()
+                                .unstack().reindex(columns=llm_names).fillna(0.0))
+        
+        return {
             "evaluation_info": {
                 "total_methods": len(self.results),
-                "categories": list(set(r["category"] for r in self.results.values())),
-                "llms_evaluated": list(LLM_CONFIGS.keys()),
+                "categories": sorted(self._categories),
+                "llms_evaluated": llm_names,
                 "evaluation_duration_seconds": time.time() - self.start_time if self.start_time else None
             },
-            "success_rates": {},
-            "similarity_averages": {},
-            "category_performance": {}
+            "success_rates": {llm: float(rate) for llm, rate in success_rates.items()},
+            "similarity_averages": {llm: float(sim) for llm, sim in similarity_averages.items()},
+            "category_performance": {
+                category: {llm: float(sim) for llm, sim in row.items()}
+                for category, row in category_performance.iterrows()
+            }
         }
-        
-        # Calculate success rates and similarity averages per LLM
-        for llm_name in LLM_CONFIGS.keys():
-            successes = 0
-            total_sims = []
+    
+    @staticmethod
+    def _report_columns() -> list:
+        """Column headers of the per-method report sheets"""
+        columns = ["Category", "Method_Signature", "GT_Purpose", "GT_Return_Type", "GT_Return_Description"]
+        for llm in LLM_NAMES:
+            columns += [f"{llm}_Purpose", f"{llm}_Return_Type", f"{llm}_Return_Description",
+                        f"{llm}_Purpose_Similarity", f"{llm}_Return_Type_Match",
+                        f"{llm}_Return_Desc_Similarity", f"{llm}_Overall_Similarity"]
+        return columns
+    
+    def _iter_report_rows(self):
+        """Yield one report row per method, matching _report_columns"""
+        for signature, data in self.results.items():
+            ground_truth = data["ground_truth"]
+            gt_return = ground_truth["return_values"]
+            responses = data["llm_responses"]
+            similarities = data["similarities"]
+            row = [data["category"], signature, ground_truth["purpose_behavior"],
+                   gt_return["type"], gt_return["description"]]
             
-            for result in self.results.values():
-                llm_response = result["llm_responses"].get(llm_name, {})
-                if llm_response.get("success", False):
-                    successes += 1
+            # Add LLM responses and similarities
+            for llm in LLM_NAMES:
+                llm_response = responses.get(llm)
+                
+                if llm_response and llm_response.get("success", False):
+                    parsed = llm_response["parsed_response"]
+                    parsed_return = parsed.get("return_values", {})
+                    row += [parsed.get("purpose_behavior", "N/A"),
+                            parsed_return.get("type", "N/A"),
+                            parsed_return.get("description", "N/A")]
                     
-                    similarity = result["similarities"].get(llm_name, {})
-                    if similarity.get("success", False):
-                        total_sims.append(similarity["overall_similarity"])
-            
-            stats["success_rates"][llm_name] = successes / len(self.results)
-            stats["similarity_averages"][llm_name] = sum(total_sims) / len(total_sims) if total_sims else 0.0
-        
-        # Category performance
-        for category in stats["evaluation_info"]["categories"]:
-            category_results = {sig: res for sig, res in self.results.items() if res["category"] == category}
+                    # Similarity scores
+                    similarity = similarities.get(llm)
+                    if similarity and similarity.get("success", False):
+                        row += [similarity["purpose_similarity"], similarity["return_type_match"],
+                                similarity["return_desc_similarity"], similarity["overall_similarity"]]
+                    else:
+                        row += [0.0, False, 0.0, 0.0]
+                else:
+                    # Mark failed evaluations
+                    error_msg = llm_response.get("error", "EVALUATION_FAILED") if llm_response else "EVALUATION_FAILED"
+                    row += [f"ERROR: {error_msg}", "ERROR", "ERROR", 0.0, False, 0.0, 0.0]
             
-            stats["category_performance"][category] = {}
-            for llm_name in LLM_CONFIGS.keys():
-                sims = []
-                for result in category_results.values():
-                    similarity = result["similarities"].get(llm_name, {})
-                    if similarity.get("success", False):
-                        sims.append(similarity["overall_similarity"])
-                
-                stats["category_performance"][category][llm_name] = sum(sims) / len(sims) if sims else 0.0
-        
-        return stats
+            yield row
     
     def _generate_excel_report(self, output_file: str):
         """Generate comprehensive Excel report"""
         try:
-            rows = []
+            columns = self._report_columns()
             
-            for signature, data in self.results.items():
-                base_row = {
-                    "Category": data["category"],
-                    "Method_Signature": signature,
-                    "GT_Purpose": data["ground_truth"]["purpose_behavior"],
-                    "GT_Return_Type": data["ground_truth"]["return_values"]["type"],
-                    "GT_Return_Description": data["ground_truth"]["return_values"]["description"]
-                }
+            # Save to Excel with multiple sheets, streaming rows to disk
+            with pd.ExcelWriter(output_file, engine='xlsxwriter',
+                                engine_kwargs={'options': {'constant_memory': True}}) as writer:
+                # Full results and the category-wise sheets are filled in one pass over the results
+                full_sheet = writer.book.add_worksheet('Full_Results')
+                full_sheet.write_row(0, 0, columns)
+                category_sheets = {}  # category -> [worksheet, next row]
                 
-                # Add LLM responses and similarities
-                for llm in LLM_CONFIGS.keys():
-                    llm_response = data["llm_responses"].get(llm, {})
+                for row_idx, row in enumerate(self._iter_report_rows(), start=1):
+                    full_sheet.write_row(row_idx, 0, row)
                     
-                    if llm_response.get("success", False):
-                        parsed = llm_response["parsed_response"]
-                        base_row[f"{llm}_Purpose"] = parsed.get("purpose_behavior", "N/A")
-                        base_row[f"{llm}_Return_Type"] = parsed.get("return_values", {}).get("type", "N/A")
-                        base_row[f"{llm}_Return_Description"] = parsed.get("return_values", {}).get("description", "N/A")
-                        
-                        # Similarity scores
-                        similarity = data["similarities"].get(llm, {})
-                        if similarity.get("success", False):
-                            base_row[f"{llm}_Purpose_Similarity"] = similarity["purpose_similarity"]
-                            base_row[f"{llm}_Return_Type_Match"] = similarity["return_type_match"]
-                            base_row[f"{llm}_Return_Desc_Similarity"] = similarity["return_desc_similarity"]
-                            base_row[f"{llm}_Overall_Similarity"] = similarity["overall_similarity"]
-                        else:
-                            base_row[f"{llm}_Purpose_Similarity"] = 0.0
-                            base_row[f"{llm}_Return_Type_Match"] = False
-                            base_row[f"{llm}_Return_Desc_Similarity"] = 0.0
-                            base_row[f"{llm}_Overall_Similarity"] = 0.0
-                    else:
-                        # Mark failed evaluations
-                        error_msg = llm_response.get("error", "EVALUATION_FAILED")
-                        base_row[f"{llm}_Purpose"] = f"ERROR: {error_msg}"
-                        base_row[f"{llm}_Return_Type"] = "ERROR"
-                        base_row[f"{llm}_Return_Description"] = "ERROR"
-                        base_row[f"{llm}_Purpose_Similarity"] = 0.0
-                        base_row[f"{llm}_Return_Type_Match"] = False
-                        base_row[f"{llm}_Return_Desc_Similarity"] = 0.0
-                        base_row[f"{llm}_Overall_Similarity"] = 0.0
-                
-                rows.append(base_row)
-            
-            # Create DataFrame
-            df = pd.DataFrame(rows)
-            
-            # Save to Excel with multiple sheets
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                # Full results
-                df.to_excel(writer, sheet_name='Full_Results', index=False)
-                
-                # Category-wise sheets
-                for category in df['Category'].unique():
-                    category_df = df[df['Category'] == category]
-                    safe_name = category.replace(' ', '_').replace('/', '_')[:31]
-                    category_df.to_excel(writer, sheet_name=safe_name, index=False)
+                    category = row[0]
+                    if category not in category_sheets:
+                        safe_name = category.replace(' ', '_').replace('/', '_')[:31]
+                        worksheet = writer.book.add_worksheet(safe_name)
+                        worksheet.write_row(0, 0, columns)
+                        category_sheets[category] = [worksheet, 1]
+                    sheet = category_sheets[category]
+                    sheet[0].write_row(sheet[1], 0, row)
+                    sheet[1] += 1
                 
                 # Summary statistics
-                summary_stats = self._generate_summary_stats()
-                summary_df = pd.DataFrame([
+                summary_stats = self._get_summary_stats()
+                summary_rows = [
                     {"Metric": "Total Methods", "Value": summary_stats["evaluation_info"]["total_methods"]},
                     {"Metric": "Categories", "Value": len(summary_stats["evaluation_info"]["categories"])},
                     {"Metric": "LLMs", "Value": len(summary_stats["evaluation_info"]["llms_evaluated"])}
-                ])
-                
-                for llm, success_rate in summary_stats["success_rates"].items():
-                    summary_df = pd.concat([summary_df, pd.DataFrame([{
-                        "Metric": f"{llm}_Success_Rate", 
-                        "Value": f"{success_rate:.3f}"
-                    }])], ignore_index=True)
+                ]
+                summary_rows += [
+                    {"Metric": f"{llm}_Success_Rate", "Value": f"{success_rate:.3f}"}
+                    for llm, success_rate in summary_stats["success_rates"].items()
+                ]
+                summary_rows += [
+                    {"Metric": f"{llm}_Avg_Similarity", "Value": f"{avg_sim:.3f}"}
+                    for llm, avg_sim in summary_stats["similarity_averages"].items()
+                ]
                 
-                for llm, avg_sim in summary_stats["similarity_averages"].items():
-                    summary_df = pd.concat([summary_df, pd.DataFrame([{
-                        "Metric": f"{llm}_Avg_Similarity", 
-                        "Value": f"{avg_sim:.3f}"
-                    }])], ignore_index=True)
-                
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
+                summary_df = pd.DataFrame(summary_rows)
+                self._write_sheet(writer, 'Summary', summary_df)
             
             logger.info(f"Excel report generated: {output_file}")
             
         except Exception as e:
             logger.error(f"Failed to generate Excel report: {e}")
     
+    @staticmethod
+    def _write_sheet(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame):
+        """Write a DataFrame to a new sheet row by row"""
+        # constant_memory mode drops cells written out of row order, and
+        # DataFrame.to_excel writes column by column
+        worksheet = writer.book.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, list(df.columns))
+        
+        values = df.astype(object).where(df.notna(), None)
+        for row_idx, row in enumerate(values.itertuples(index=False), start=1):
+            worksheet.write_row(row_idx, 0, row)
+    
     def _print_evaluation_summary(self):
         """Print evaluation summary to console"""
-        summary = self._generate_summary_stats()
+        summary = self._get_summary_stats()
         
         print("\n" + "="*60)
         print("EVALUATION SUMMARY")
@@ -2,62 +2,317 @@
 LLM Interface for querying different language models
 """
 
+import asyncio
+import functools
+import hashlib
 import json
+import orjson
+import sqlite3
 import time
-import requests
+import aiohttp
 from typing import Dict, Any, Optional
 import logging
-from config import LLM_CONFIGS, OPENAI_API_KEY, OLLAMA_BASE_URL, MAX_RETRIES, PROMPT_TEMPLATE
+from config import (
+    LLM_CONFIGS, OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_BATCH_POLL_INTERVAL, OLLAMA_BASE_URL,
+    OLLAMA_MAX_CONCURRENT_TOTAL, MAX_RETRIES, PROMPT_TEMPLATE, RESPONSE_CACHE_FILE
+)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Get the tiktoken encoding for an OpenAI model"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def estimate_tokens(prompt: str, config: Dict) -> int:
+    """Estimate prompt tokens: tiktoken for OpenAI models, ~4 characters per token otherwise"""
+    if config["type"] == "openai" and tiktoken is not None:
+        return len(_get_encoding(config["model"]).encode(prompt))
+    return len(prompt) // 4
+
+class RateLimited(Exception):
+    """Raised on HTTP 429; retry_after is the server-requested wait in seconds"""
+    
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+class TokenBucket:
+    """Async limiter on requests and tokens per minute, refilled continuously"""
+    
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = rpm or 0.0
+        self._tokens = tpm or 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+    
+    async def acquire(self, estimated_tokens: int = 0):
+        """Wait until one request and estimated_tokens fit in the budget, then take them"""
+        async with self._lock:
+            if self.tpm:
+                # A request larger than the whole budget only waits for a full bucket
+                estimated_tokens = min(estimated_tokens, self.tpm)
+            
+            while True:
+                self._refill()
+                waits = []
+                if self._paused_until > self._updated:
+                    waits.append(self._paused_until - self._updated)
+                if self.rpm and self._requests < 1:
+                    waits.append((1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < estimated_tokens:
+                    waits.append((estimated_tokens - self._tokens) * 60 / self.tpm)
+                if not waits:
+                    break
+                await asyncio.sleep(max(waits))
+            
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= estimated_tokens
+    
+    def pause(self, seconds: float):
+        """Hold back all requests for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def sync(self, remaining_requests: Optional[float] = None, remaining_tokens: Optional[float] = None):
+        """Clamp the local budget to what the server reports as remaining"""
+        self._refill()
+        if self.rpm and remaining_requests is not None:
+            self._requests = min(self._requests, remaining_requests)
+        if self.tpm and remaining_tokens is not None:
+            self._tokens = min(self._tokens, remaining_tokens)
+
+class ResponseCache:
+    """Persistent exact-match cache of raw LLM responses, backed by SQLite"""
+    
+    def __init__(self, file_path: str):
+        self.conn = sqlite3.connect(file_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(prompt: str, config: Dict) -> str:
+        """Hash the model, temperature and prompt that determine a response"""
+        payload = json.dumps({"m": config["model"], "t": config["temperature"], "p": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, response: str):
+        self.conn.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response))
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
 class LLMInterface:
     """Handles communication with different LLM providers"""
     
-    def __init__(self, openai_api_key: str = OPENAI_API_KEY, ollama_base_url: str = OLLAMA_BASE_URL):
+    def __init__(self, openai_api_key: str = OPENAI_API_KEY, ollama_base_url: str = OLLAMA_BASE_URL,
+                 cache_file: Optional[str] = RESPONSE_CACHE_FILE):
         self.openai_api_key = openai_api_key
         self.ollama_base_url = ollama_base_url
         self.llm_configs = LLM_CONFIGS
         
+        # One keep-alive connection pool per provider type ("openai", "ollama")
+        self.sessions = {}
+        
+        # Response cache, opened with the session; None disables caching
+        self.cache_file = cache_file
+        self.cache = None
+        
+        # Requests in flight per provider: the sum of its models' limits, except that all
+        # Ollama models share one server
+        self.provider_limits = {}
+        for config in self.llm_configs.values():
+            self.provider_limits[config["type"]] = self.provider_limits.get(config["type"], 0) + config.get("max_concurrent", 1)
+        if "ollama" in self.provider_limits:
+            self.provider_limits["ollama"] = OLLAMA_MAX_CONCURRENT_TOTAL
+        
+        # Per-LLM and per-provider concurrency limits, created lazily inside the running event loop
+        self._semaphores = {}
+        self._provider_semaphores = {}
+        
+        # Per-provider request/token budgets
+        self.rate_limiters = {
+            name: TokenBucket(config.get("requests_per_minute"), config.get("tokens_per_minute"))
+            for name, config in self.llm_configs.items()
+        }
+        
         # Validate API key
         if not self.openai_api_key or self.openai_api_key == "":
             logger.warning("OpenAI API key not configured. GPT-4o evaluations will fail.")
     
+    async def open(self):
+        """Open one pooled HTTP session per provider and the response cache"""
+        for provider, pool_size in self.provider_limits.items():
+            session = self.sessions.get(provider)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size, keepalive_timeout=60)
+                self.sessions[provider] = aiohttp.ClientSession(connector=connector)
+        if self.cache is None and self.cache_file:
+            self.cache = ResponseCache(self.cache_file)
+    
+    async def close(self):
+        """Close the provider sessions and the response cache"""
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+    
+    def _get_semaphore(self, llm_name: str) -> asyncio.Semaphore:
+        """Get the concurrency limit for an LLM"""
+        if llm_name not in self._semaphores:
+            max_concurrent = self.llm_configs[llm_name].get("max_concurrent", 1)
+            self._semaphores[llm_name] = asyncio.Semaphore(max_concurrent)
+        return self._semaphores[llm_name]
+    
+    def _get_provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the concurrency limit shared by all LLMs of a provider"""
+        if provider not in self._provider_semaphores:
+            self._provider_semaphores[provider] = asyncio.Semaphore(self.provider_limits[provider])
+        return self._provider_semaphores[provider]
+    
     def create_prompt(self, method_signature: str) -> str:
         """Create standardized prompt for method evaluation"""
         return PROMPT_TEMPLATE.format(method_signature=method_signature)
     
-    def query_openai(self, prompt: str, config: Dict) -> str:
-        """Query OpenAI API"""
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
+    @staticmethod
+    def _openai_chat_body(prompt: str, config: Dict) -> Dict:
+        return {
             "model": config["model"],
             "messages": [{"role": "user", "content": prompt}],
             "temperature": config["temperature"],
             "max_tokens": config["max_tokens"]
         }
+    
+    async def query_openai(self, prompt: str, config: Dict, rate_limiter: Optional[TokenBucket] = None) -> str:
+        """Query OpenAI API, feeding its x-ratelimit-* headers back into rate_limiter"""
+        headers = {
+            "Authorization": f"Bearer {self.openai_api_key}",
+            "Content-Type": "application/json"
+        }
         
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+        data = self._openai_chat_body(prompt, config)
+        
+        async with self.sessions["openai"].post(
+            f"{OPENAI_BASE_URL}/chat/completions",
             headers=headers,
             json=data,
-            timeout=60
-        )
+            timeout=aiohttp.ClientTimeout(total=60)
+        ) as response:
+            if rate_limiter is not None:
+                rate_limiter.sync(
+                    _header_float(response.headers, "x-ratelimit-remaining-requests"),
+                    _header_float(response.headers, "x-ratelimit-remaining-tokens")
+                )
+            if response.status == 200:
+                return (await response.json(loads=orjson.loads))["choices"][0]["message"]["content"]
+            elif response.status == 429:
+                retry_after = _header_float(response.headers, "retry-after")
+                raise RateLimited(retry_after if retry_after is not None else 1.0)
+            else:
+                raise Exception(f"OpenAI API error: {response.status} - {await response.text()}")
+    
+    async def submit_openai_batch(self, prompts: Dict[str, str], config: Dict) -> Dict[str, str]:
+        """Run prompts through the OpenAI Batch API and wait for the job to finish
+        
+        Returns the response text by custom_id for the requests that succeeded.
+        """
+        session = self.sessions["openai"]
+        headers = {"Authorization": f"Bearer {self.openai_api_key}"}
+        
+        # Upload the requests as a JSONL file
+        lines = [
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._openai_chat_body(prompt, config)
+            })
+            for custom_id, prompt in prompts.items()
+        ]
+        form = aiohttp.FormData()
+        form.add_field("purpose", "batch")
+        form.add_field("file", b"\n".join(lines), filename="batch.jsonl", content_type="application/jsonl")
+        async with session.post(f"{OPENAI_BASE_URL}/files", headers=headers, data=form) as response:
+            if response.status != 200:
+                raise Exception(f"OpenAI file upload error: {response.status} - {await response.text()}")
+            input_file_id = (await response.json(loads=orjson.loads))["id"]
+        
+        async with session.post(
+            f"{OPENAI_BASE_URL}/batches",
+            headers=headers,
+            json={"input_file_id": input_file_id, "endpoint": "/v1/chat/completions", "completion_window": "24h"}
+        ) as response:
+            if response.status != 200:
+                raise Exception(f"OpenAI batch creation error: {response.status} - {await response.text()}")
+            batch = await response.json(loads=orjson.loads)
+        logger.info(f"Submitted OpenAI batch {batch['id']} with {len(prompts)} requests")
         
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        elif response.status_code == 429:
-            raise Exception("Rate limit exceeded")
-        else:
-            raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+        # Poll until the job ends; a failed poll is retried rather than abandoning the job
+        while batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(OPENAI_BATCH_POLL_INTERVAL)
+            try:
+                async with session.get(f"{OPENAI_BASE_URL}/batches/{batch['id']}", headers=headers) as response:
+                    if response.status == 200:
+                        batch = await response.json(loads=orjson.loads)
+                    else:
+                        logger.warning(f"OpenAI batch status error: {response.status} - {await response.text()}")
+            except aiohttp.ClientError as e:
+                logger.warning(f"OpenAI batch status check failed: {e}")
+        logger.info(f"OpenAI batch {batch['id']} finished with status {batch['status']}")
+        
+        # Expired jobs may still have partial output
+        responses = {}
+        if batch.get("output_file_id"):
+            async with session.get(f"{OPENAI_BASE_URL}/files/{batch['output_file_id']}/content", headers=headers) as response:
+                if response.status != 200:
+                    raise Exception(f"OpenAI batch download error: {response.status} - {await response.text()}")
+                output = await response.read()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                record_response = record.get("response") or {}
+                if record_response.get("status_code") == 200:
+                    responses[record["custom_id"]] = record_response["body"]["choices"][0]["message"]["content"]
+        return responses
     
-    def query_ollama(self, prompt: str, config: Dict) -> str:
+    async def query_ollama(self, prompt: str, config: Dict) -> str:
         """Query Ollama local API"""
         data = {
             "model": config["model"],
@@ -69,17 +324,16 @@ class LLMInterface:
         }
         
         try:
-            response = requests.post(
+            async with self.sessions["ollama"].post(
                 f"{self.ollama_base_url}/api/generate",
                 json=data,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                return response.json()["response"]
-            else:
-                raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
-        except requests.exceptions.ConnectionError:
+                timeout=aiohttp.ClientTimeout(total=120)
+            ) as response:
+                if response.status == 200:
+                    return (await response.json(loads=orjson.loads))["response"]
+                else:
+                    raise Exception(f"Ollama API error: {response.status} - {await response.text()}")
+        except aiohttp.ClientConnectionError:
             raise Exception("Cannot connect to Ollama. Make sure Ollama is running locally.")
     
     def parse_llm_response(self, raw_response: str) -> Dict:
@@ -95,7 +349,7 @@ class LLMInterface:
                 raw_response = raw_response[3:-3].strip()
             
             # Try to parse JSON
-            parsed = json.loads(raw_response)
+            parsed = orjson.loads(raw_response)
             
             # Validate required fields
             if "purpose_behavior" not in parsed:
@@ -109,7 +363,7 @@ class LLMInterface:
             
             return parsed
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON parse error: {e}")
             return {
                 "purpose_behavior": f"PARSE_ERROR: {raw_response[:200]}",
@@ -130,43 +384,123 @@ class LLMInterface:
                 "validation_error": str(e)
             }
     
-    def evaluate_method(self, method_signature: str, llm_name: str) -> Dict:
+    def _cached_result(self, cache_key: str, method_signature: str, llm_name: str) -> Optional[Dict]:
+        """Build the evaluation result from a cached response, if there is one"""
+        cached_response = self.cache.get(cache_key) if self.cache else None
+        if cached_response is None:
+            return None
+        
+        logger.info(f"Using cached response for {method_signature} with {llm_name}")
+        return {
+            "llm": llm_name,
+            "method_signature": method_signature,
+            "parsed_response": self.parse_llm_response(cached_response),
+            "success": True,
+            "attempt": 0,
+            "cached": True,
+            "timestamp": time.time()
+        }
+    
+    def _response_result(self, raw_response: str, cache_key: str, method_signature: str,
+                         llm_name: str, attempt: int) -> Dict:
+        """Build the evaluation result from a fresh response"""
+        # Parse response; only well-formed answers are cached so reruns retry the rest
+        parsed_response = self.parse_llm_response(raw_response)
+        malformed = "parse_error" in parsed_response or "validation_error" in parsed_response
+        if self.cache and not malformed:
+            self.cache.set(cache_key, raw_response)
+        
+        result = {
+            "llm": llm_name,
+            "method_signature": method_signature,
+            "parsed_response": parsed_response,
+            "success": True,
+            "attempt": attempt,
+            "timestamp": time.time()
+        }
+        # The raw text duplicates parsed_response; keep it only to debug malformed answers
+        if malformed:
+            result["raw_response"] = raw_response
+        return result
+    
+    async def evaluate_prompts_batch(self, prompts: Dict[str, str], llm_name: str) -> Dict[str, Dict]:
+        """Evaluate many methods with an OpenAI LLM in one Batch API job
+        
+        prompts maps method signatures to prompts. Signatures missing from the
+        returned results failed in the batch and need a realtime query.
+        """
+        config = self.llm_configs[llm_name]
+        if config["type"] != "openai":
+            raise ValueError(f"Batch evaluation is only supported for OpenAI models, not {llm_name}")
+        
+        results = {}
+        to_submit = {}  # custom_id -> (signature, cache key, prompt)
+        for method_signature, prompt in prompts.items():
+            cache_key = ResponseCache.make_key(prompt, config)
+            cached_result = self._cached_result(cache_key, method_signature, llm_name)
+            if cached_result is not None:
+                results[method_signature] = cached_result
+            else:
+                to_submit[str(len(to_submit))] = (method_signature, cache_key, prompt)
+        
+        if to_submit:
+            responses = await self.submit_openai_batch(
+                {custom_id: prompt for custom_id, (_, _, prompt) in to_submit.items()}, config
+            )
+            for custom_id, raw_response in responses.items():
+                method_signature, cache_key, _ = to_submit[custom_id]
+                results[method_signature] = self._response_result(raw_response, cache_key, method_signature, llm_name, 1)
+                results[method_signature]["batch"] = True
+            logger.info(f"OpenAI batch for {llm_name}: {len(responses)}/{len(to_submit)} requests succeeded")
+        
+        return results
+    
+    async def evaluate_method(self, method_signature: str, llm_name: str) -> Dict:
         """Evaluate a single method with specified LLM"""
+        return await self.evaluate_prompt(self.create_prompt(method_signature), method_signature, llm_name)
+    
+    async def evaluate_prompt(self, prompt: str, method_signature: str, llm_name: str) -> Dict:
+        """Evaluate a method with specified LLM from its already-built prompt"""
         if llm_name not in self.llm_configs:
             raise ValueError(f"Unknown LLM: {llm_name}")
         
         config = self.llm_configs[llm_name]
-        prompt = self.create_prompt(method_signature)
+        semaphore = self._get_semaphore(llm_name)
+        provider_semaphore = self._get_provider_semaphore(config["type"])
+        rate_limiter = self.rate_limiters[llm_name]
+        request_tokens = estimate_tokens(prompt, config) + config.get("max_tokens", 0)
+        
+        # Serve repeated (model, temperature, prompt) queries from the cache
+        cache_key = ResponseCache.make_key(prompt, config)
+        cached_result = self._cached_result(cache_key, method_signature, llm_name)
+        if cached_result is not None:
+            return cached_result
         
         logger.info(f"Evaluating {method_signature} with {llm_name}")
         
+        rate_limited = False
         for attempt in range(MAX_RETRIES):
             try:
-                # Rate limiting
-                if attempt > 0:
-                    time.sleep(2 ** attempt)  # Exponential backoff
+                # Back off exponentially on failures; after a 429 the paused rate limiter does the waiting
+                if attempt > 0 and not rate_limited:
+                    await asyncio.sleep(2 ** attempt)
+                rate_limited = False
                 
-                # Query LLM
-                if config["type"] == "openai":
-                    raw_response = self.query_openai(prompt, config)
-                else:  # ollama
-                    raw_response = self.query_ollama(prompt, config)
+                # Query LLM once the provider has request and token headroom
+                async with semaphore, provider_semaphore:
+                    await rate_limiter.acquire(request_tokens)
+                    if config["type"] == "openai":
+                        raw_response = await self.query_openai(prompt, config, rate_limiter)
+                    else:  # ollama
+                        raw_response = await self.query_ollama(prompt, config)
                 
-                # Parse response
-                parsed_response = self.parse_llm_response(raw_response)
-                
-                return {
-                    "llm": llm_name,
-                    "method_signature": method_signature,
-                    "raw_response": raw_response,
-                    "parsed_response": parsed_response,
-                    "success": True,
-                    "attempt": attempt + 1,
-                    "timestamp": time.time()
-                }
+                return self._response_result(raw_response, cache_key, method_signature, llm_name, attempt + 1)
                 
             except Exception as e:
                 logger.warning(f"Attempt {attempt + 1} failed for {llm_name} on {method_signature}: {str(e)}")
+                if isinstance(e, RateLimited):
+                    rate_limiter.pause(e.retry_after)
+                    rate_limited = True
                 
                 if attempt < MAX_RETRIES - 1:
                     continue
@@ -179,8 +513,3 @@ class LLMInterface:
                         "attempt": attempt + 1,
                         "timestamp": time.time()
                     }
-        
-        # Apply rate limiting
-        time.sleep(config.get("rate_limit_delay", 1))
-        
-        return result
@@ -6,10 +6,11 @@ import os
 import sys
 import logging
 import argparse
+import importlib.util
 from datetime import datetime
 
 from evaluator import FrameworkMethodEvaluator
-from config import GROUND_TRUTH_FILE, OPENAI_API_KEY, OUTPUT_DIR
+from config import GROUND_TRUTH_FILE, OPENAI_API_KEY, OUTPUT_DIR, RESPONSE_CACHE_FILE, EMBEDDING_CACHE_FILE
 
 def setup_logging(output_dir: str, log_level: str = "INFO"):
     """Setup logging configuration"""
@@ -42,12 +43,9 @@ def validate_setup():
     if not OPENAI_API_KEY or OPENAI_API_KEY == "your-openai-api-key-here":
         errors.append("OpenAI API key not configured. Set OPENAI_API_KEY environment variable.")
     
-    # Check if sentence-transformers model can be loaded
-    try:
-        from sentence_transformers import SentenceTransformer
-        SentenceTransformer('all-MiniLM-L6-v2')
-    except Exception as e:
-        errors.append(f"Cannot load sentence transformer model: {e}")
+    # Check that sentence-transformers is installed; the model itself is loaded once, by the evaluator
+    if importlib.util.find_spec("sentence_transformers") is None:
+        errors.append("sentence-transformers is not installed")
     
     return errors
 
@@ -58,12 +56,20 @@ def main():
     parser.add_argument("--output-dir", default=OUTPUT_DIR,
                        help="Output directory for results")
     parser.add_argument("--resume-from", default=None,
-                       help="Resume from previous evaluation results file")
+                       help="Resume from previous evaluation results file (.json, or a progress.jsonl log)")
     parser.add_argument("--log-level", default="INFO",
                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                        help="Logging level")
     parser.add_argument("--dry-run", action="store_true",
                        help="Validate setup without running evaluation")
+    parser.add_argument("--cache-file", default=RESPONSE_CACHE_FILE,
+                       help="SQLite file caching LLM responses across runs")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always query the LLMs instead of reusing cached responses")
+    parser.add_argument("--embedding-cache-file", default=EMBEDDING_CACHE_FILE,
+                       help="File caching sentence embeddings across runs")
+    parser.add_argument("--batch-openai", action="store_true",
+                       help="Send OpenAI queries through the Batch API, retrying failures in realtime")
     
     args = parser.parse_args()
     
@@ -91,14 +97,17 @@ def main():
         logger.info("Initializing evaluator...")
         evaluator = FrameworkMethodEvaluator(
             ground_truth_file=args.ground_truth,
-            openai_api_key=OPENAI_API_KEY
+            openai_api_key=OPENAI_API_KEY,
+            cache_file=None if args.no_cache else args.cache_file,
+            embedding_cache_file=args.embedding_cache_file
         )
         
         # Run evaluation
         logger.info("Starting evaluation...")
         evaluator.run_full_evaluation(
             output_dir=args.output_dir,
-            resume_from=args.resume_from
+            resume_from=args.resume_from,
+            batch_openai=args.batch_openai
         )
         
         logger.info("Evaluation completed successfully!")
@@ -2,123 +2,364 @@
 Utility functions for framework evaluation
 """
 
-import json
+import functools
+import hashlib
+import orjson
 import os
+import sys
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Optional
 import logging
 
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
 logger = logging.getLogger(__name__)
 
+# Below this many texts, starting worker processes costs more than it saves
+MULTI_PROCESS_MIN_TEXTS = 2048
+
+# Flattened method lists by id(ground_truth); the entry keeps its ground truth alive so the id can't be reused
+_METHOD_LIST_CACHE_SIZE = 4
+_method_list_cache: Dict[int, tuple] = {}
+
+# Output directories save_json has already created during this process
+_ensured_dirs = set()
+
+@functools.lru_cache(maxsize=None)
+def get_sentence_model(model_name: str = 'all-MiniLM-L6-v2', half: bool = False, backend: str = 'torch',
+                       model_file: Optional[str] = None):
+    """Load a SentenceTransformer model once per process
+    
+    backend "onnx" or "openvino" loads the exported model_file (falling back to torch
+    if that fails); the torch model runs in FP16 on CUDA if half is set.
+    """
+    # Imported here so that importing utils does not pull in torch
+    from sentence_transformers import SentenceTransformer
+    if backend != 'torch':
+        try:
+            model_kwargs = {"file_name": model_file} if model_file else None
+            return SentenceTransformer(model_name, backend=backend, model_kwargs=model_kwargs)
+        except Exception as e:
+            logger.warning(f"Could not load {model_name} with the {backend} backend, using torch: {e}")
+    
+    model = SentenceTransformer(model_name)
+    if half and getattr(model, "device", None) is not None and model.device.type == "cuda":
+        model.half()
+    return model
+
+def quantize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """Scale each embedding into the int8 range; cosines are preserved up to rounding"""
+    scale = 127.0 / np.maximum(np.abs(embeddings).max(axis=1, keepdims=True), 1e-12)
+    return np.round(embeddings * scale).astype(np.int8)
+
+def _row_cosines(a: np.ndarray, b: np.ndarray, quantize: bool = False) -> np.ndarray:
+    """Cosine similarity of matching rows of two normalized embedding matrices"""
+    if simsimd is not None and quantize:
+        # int8 rows are no longer unit length, so take the full cosine
+        distances = simsimd.cosine(quantize_embeddings(a), quantize_embeddings(b))
+        return 1.0 - np.asarray(distances)
+    # simsimd releases before dot only have inner, which returns a distance
+    if simsimd is not None and hasattr(simsimd, 'dot'):
+        # Rows are L2-normalized, so the cosine is the fused row-wise dot product
+        return np.asarray(simsimd.dot(np.ascontiguousarray(a, dtype=np.float32),
+                                      np.ascontiguousarray(b, dtype=np.float32)))
+    return np.einsum('ij,ij->i', a, b)
+
 class SimilarityCalculator:
     """Handles semantic similarity calculations"""
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', reduced_precision: bool = False,
+                 cache_file: Optional[str] = None, backend: str = 'torch', model_file: Optional[str] = None,
+                 processes: int = 0):
+        # reduced_precision: FP16 model on CUDA and int8 embeddings for batched cosines
+        # processes: CPU worker processes for large corpus encodes (torch backend only; 0 disables)
+        self.reduced_precision = reduced_precision
+        self.processes = processes
         try:
-            self.model = SentenceTransformer(model_name)
+            self.model = get_sentence_model(model_name, half=reduced_precision, backend=backend, model_file=model_file)
             logger.info(f"Loaded similarity model: {model_name}")
         except Exception as e:
             logger.error(f"Failed to load similarity model: {e}")
             raise
+        
+        # Embeddings by text digest, persisted to cache_file across runs if set
+        self.cache_file = cache_file
+        loaded_backend = getattr(self.model, 'backend', 'torch')
+        # Different exports of the same model can give different embeddings, so the file is part of the tag
+        export_file = model_file if loaded_backend != 'torch' and model_file else ''
+        self._cache_tag = f"{model_name}|{loaded_backend}|{export_file}|{'fp16' if reduced_precision else 'fp32'}"
+        self._emb_cache = {}
+        if cache_file and os.path.exists(cache_file):
+            self._load_cache()
+        
+        self._pool = None  # multi-process encode pool, shared by the encodes of one scoring pass
+    
+    @staticmethod
+    def _text_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
     
-    def calculate_similarity(self, text1: str, text2: str) -> float:
-        """Calculate cosine similarity between two texts"""
+    def _load_cache(self):
         try:
-            embeddings = self.model.encode([text1, text2])
-            similarity = np.dot(embeddings[0], embeddings[1]) / (
-                np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
-            )
-            return float(similarity)
+            with np.load(self.cache_file) as data:
+                if str(data["tag"]) != self._cache_tag:
+                    logger.info(f"Ignoring embedding cache {self.cache_file} built for {data['tag']}")
+                    return
+                self._emb_cache = {key.tobytes(): embedding for key, embedding in zip(data["keys"], data["embeddings"])}
+            logger.info(f"Loaded {len(self._emb_cache)} cached embeddings from {self.cache_file}")
         except Exception as e:
-            logger.error(f"Similarity calculation failed: {e}")
-            return 0.0
+            logger.warning(f"Could not load embedding cache {self.cache_file}: {e}")
+    
+    def save_cache(self):
+        """Write the embedding cache to cache_file, if one is set"""
+        if not self.cache_file or not self._emb_cache:
+            return
+        keys = np.frombuffer(b"".join(self._emb_cache), dtype=np.uint8).reshape(-1, 16)
+        np.savez(self.cache_file, tag=np.array(self._cache_tag), keys=keys,
+                 embeddings=np.stack(list(self._emb_cache.values())))
+        logger.info(f"Saved {len(self._emb_cache)} embeddings to {self.cache_file}")
+    
+    def encode_corpus(self, texts: list, batch_size: int = 64) -> np.ndarray:
+        """Encode many texts into L2-normalized embeddings"""
+        if (self.processes > 1 and len(texts) >= MULTI_PROCESS_MIN_TEXTS
+                and getattr(self.model, 'backend', 'torch') == 'torch'):
+            # Workers get chunks in input order, so sort by length to keep the padding inside each batch small
+            order = np.argsort([len(text) for text in texts], kind='stable')
+            embeddings = self.encode_multi([texts[i] for i in order])
+            result = np.empty(embeddings.shape, dtype=np.float32)
+            result[order] = embeddings
+            return result
+        # encode sorts by length internally
+        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False,
+                                       convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    def encode_multi(self, texts: list, batch_size: int = 32) -> np.ndarray:
+        """Encode texts into L2-normalized embeddings, sharded across CPU worker processes
+
+        The pool is started on first use and kept for later encodes until close() is called.
+        """
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(target_devices=['cpu'] * self.processes)
+        return self.model.encode_multi_process(texts, self._pool, batch_size=batch_size, normalize_embeddings=True)
+    
+    def close(self):
+        """Stop the worker processes started by encode_multi, if any"""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+    
+    def encode_cached(self, texts: list) -> np.ndarray:
+        """Like encode_corpus, but encodes each distinct text not already in the cache only once"""
+        keys = [self._text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._emb_cache:
+                missing[key] = text
+        if missing:
+            self._emb_cache.update(zip(missing, self.encode_corpus(list(missing.values()))))
+        return np.stack([self._emb_cache[key] for key in keys])
 
 def load_ground_truth(file_path: str) -> Dict:
     """Load ground truth data from JSON file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = orjson.loads(Path(file_path).read_bytes())
         logger.info(f"Loaded ground truth from {file_path}")
         return data
     except FileNotFoundError:
         logger.error(f"Ground truth file not found: {file_path}")
         raise
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"Invalid JSON in ground truth file: {e}")
         raise
 
+def load_progress_log(file_path: str) -> Dict:
+    """Load results from a JSONL progress log of {signature: result} lines"""
+    results = {}
+    with open(file_path, 'rb') as f:
+        for line_number, line in enumerate(f, start=1):
+            try:
+                results.update(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                # A run killed mid-write leaves a truncated last line
+                logger.warning(f"Skipping unreadable line {line_number} in {file_path}")
+    logger.info(f"Loaded {len(results)} results from {file_path}")
+    return results
+
 def save_json(data: Dict, file_path: str):
     """Save data to JSON file"""
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        directory = os.path.dirname(file_path)
+        if directory and directory not in _ensured_dirs:
+            os.makedirs(directory, exist_ok=True)
+            _ensured_dirs.add(directory)
+        # Serialize in memory first so the file gets a single write; like json.dump,
+        # accept non-string keys
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        Path(file_path).write_bytes(payload)
         logger.info(f"Saved data to {file_path}")
     except Exception as e:
         logger.error(f"Failed to save JSON to {file_path}: {e}")
         raise
 
-def calculate_method_similarity(ground_truth: Dict, llm_response: Dict, similarity_calc: SimilarityCalculator) -> Dict:
-    """Calculate similarity scores for a method evaluation"""
-    try:
-        # Purpose similarity
-        purpose_sim = similarity_calc.calculate_similarity(
-            ground_truth["purpose_behavior"],
-            llm_response["purpose_behavior"]
-        )
-        
-        # Return type exact match
-        gt_type = ground_truth["return_values"]["type"].lower().strip()
-        llm_type = llm_response["return_values"]["type"].lower().strip()
-        type_match = gt_type == llm_type
-        
-        # Return description similarity
-        return_desc_sim = similarity_calc.calculate_similarity(
-            ground_truth["return_values"]["description"],
-            llm_response["return_values"]["description"]
-        )
-        
-        # Overall combined similarity
-        gt_combined = (
-            ground_truth["purpose_behavior"] + " Returns " + 
-            ground_truth["return_values"]["type"] + ": " + 
-            ground_truth["return_values"]["description"]
-        )
-        
-        llm_combined = (
-            llm_response["purpose_behavior"] + " Returns " + 
-            llm_response["return_values"]["type"] + ": " + 
-            llm_response["return_values"]["description"]
-        )
-        
-        overall_sim = similarity_calc.calculate_similarity(gt_combined, llm_combined)
-        
-        return {
-            "purpose_similarity": purpose_sim,
-            "return_type_match": type_match,
-            "return_desc_similarity": return_desc_sim,
-            "overall_similarity": overall_sim,
-            "success": True
+def _combined_text(method: Dict) -> str:
+    return_values = method["return_values"]
+    return f'{method["purpose_behavior"]} Returns {return_values["type"]}: {return_values["description"]}'
+
+def _normalize_type(type_name: str) -> str:
+    # Interned, so matching types usually compare by identity
+    return sys.intern(type_name.lower().strip())
+
+def _similarity_texts(method: Dict) -> list:
+    """Texts compared for a method: purpose, return description and combined"""
+    # Check each field here so one malformed answer fails only its own method, not the shared corpus encode
+    for field, value in (("purpose_behavior", method["purpose_behavior"]),
+                         ("return_values.type", method["return_values"]["type"]),
+                         ("return_values.description", method["return_values"]["description"])):
+        if not isinstance(value, str):
+            raise TypeError(f"{field} is {type(value).__name__}, expected str")
+    return [method["purpose_behavior"], method["return_values"]["description"], _combined_text(method)]
+
+def _embed_ground_truth(methods: list, similarity_calc: SimilarityCalculator) -> Dict:
+    """Embed the compared texts of ground-truth method entries in one corpus pass, keyed by signature
+
+    Malformed entries are logged and left out, so only the methods scored against them fail.
+    """
+    valid = []
+    texts = []
+    for method in methods:
+        try:
+            method_texts = _similarity_texts(method)
+        except Exception as e:
+            logger.error(f"Skipping malformed ground truth for {method.get('signature')}: {e}")
+            continue
+        valid.append(method)
+        texts.extend(method_texts)
+    methods = valid
+    embeddings = similarity_calc.encode_cached(texts) if texts else None
+    return {
+        method["signature"]: {
+            "purpose_emb": embeddings[3 * idx],
+            "return_desc_emb": embeddings[3 * idx + 1],
+            "combined_emb": embeddings[3 * idx + 2],
+            "return_type_norm": _normalize_type(method["return_values"]["type"])
         }
-        
+        for idx, method in enumerate(methods)
+    }
+
+def precompute_ground_truth(ground_truth: Dict, similarity_calc: SimilarityCalculator) -> Dict:
+    """Embed every ground-truth method once so scoring only has to encode the LLM side"""
+    return _embed_ground_truth([method["data"] for method in get_method_list(ground_truth)], similarity_calc)
+
+def _gt_matrix(gt_embedding: Dict) -> np.ndarray:
+    return np.stack([gt_embedding["purpose_emb"], gt_embedding["return_desc_emb"], gt_embedding["combined_emb"]])
+
+def _similarity_scores(gt_embedding: Dict, llm_response: Dict, cosines) -> Dict:
+    """Score a method from the cosines of its three _similarity_texts pairs"""
+    # Return type exact match
+    llm_type = _normalize_type(llm_response["return_values"]["type"])
+    type_match = gt_embedding["return_type_norm"] == llm_type
+    
+    purpose_sim, return_desc_sim, overall_sim = (float(sim) for sim in cosines)
+    
+    return {
+        "purpose_similarity": purpose_sim,
+        "return_type_match": type_match,
+        "return_desc_similarity": return_desc_sim,
+        "overall_similarity": overall_sim,
+        "success": True
+    }
+
+def _failed_similarity(error: Exception) -> Dict:
+    logger.error(f"Similarity calculation failed: {error}")
+    return {
+        "purpose_similarity": 0.0,
+        "return_type_match": False,
+        "return_desc_similarity": 0.0,
+        "overall_similarity": 0.0,
+        "success": False,
+        "error": str(error)
+    }
+
+def calculate_similarities(pairs: list, similarity_calc: SimilarityCalculator,
+                           gt_embeddings: Optional[Dict] = None) -> list:
+    """Calculate similarity scores for many (ground truth, LLM response) pairs with one corpus encode
+
+    Ground-truth embeddings are looked up by signature in gt_embeddings (see precompute_ground_truth);
+    methods missing from it are embedded here and added to it.
+    """
+    if gt_embeddings is None:
+        gt_embeddings = {}
+    missing = {}
+    for ground_truth, _ in pairs:
+        try:
+            if ground_truth["signature"] not in gt_embeddings:
+                missing[ground_truth["signature"]] = ground_truth
+        except Exception:
+            pass  # reported per pair below
+    if missing:
+        try:
+            gt_embeddings.update(_embed_ground_truth(list(missing.values()), similarity_calc))
+        except Exception as e:
+            logger.error(f"Ground truth embedding failed: {e}")
+    
+    results = [None] * len(pairs)
+    texts = []
+    gt_positions = {}  # signature -> position of its block of three rows in the ground-truth matrix
+    gt_blocks = []  # ground-truth block position for each pair in starts
+    starts = []  # (pair index, offset of its texts)
+    for idx, (ground_truth, llm_response) in enumerate(pairs):
+        try:
+            signature = ground_truth["signature"]
+            if signature not in gt_embeddings:
+                raise KeyError(f"no ground-truth embeddings for {signature}")
+            pair_texts = _similarity_texts(llm_response)
+        except Exception as e:
+            results[idx] = _failed_similarity(e)
+            continue
+        starts.append((idx, len(texts)))
+        texts.extend(pair_texts)
+        gt_blocks.append(gt_positions.setdefault(signature, len(gt_positions)))
+    
+    if not texts:
+        return results
+    
+    try:
+        # Stack each distinct ground truth once, then gather its rows for every response scored against it
+        gt_matrix = np.concatenate([_gt_matrix(gt_embeddings[signature]) for signature in gt_positions])
+        rows = (3 * np.asarray(gt_blocks)[:, None] + np.arange(3)).ravel()
+        cosines = _row_cosines(gt_matrix[rows], similarity_calc.encode_cached(texts),
+                               similarity_calc.reduced_precision)
     except Exception as e:
-        logger.error(f"Similarity calculation failed: {e}")
-        return {
-            "purpose_similarity": 0.0,
-            "return_type_match": False,
-            "return_desc_similarity": 0.0,
-            "overall_similarity": 0.0,
-            "success": False,
-            "error": str(e)
-        }
+        for idx, _ in starts:
+            results[idx] = _failed_similarity(e)
+        return results
+    
+    for idx, start in starts:
+        ground_truth, llm_response = pairs[idx]
+        try:
+            results[idx] = _similarity_scores(gt_embeddings[ground_truth["signature"]], llm_response,
+                                              cosines[start:start + 3])
+        except Exception as e:
+            results[idx] = _failed_similarity(e)
+    return results
 
 def count_total_methods(ground_truth: Dict) -> int:
     """Count total number of methods in ground truth"""
     return sum(len(methods) for methods in ground_truth["framework_methods"].values())
 
 def get_method_list(ground_truth: Dict) -> list:
-    """Get flat list of all methods with their categories"""
+    """Get flat list of all methods with their categories
+
+    The list is built once per ground-truth dict and shared between callers, so treat it as read-only.
+    """
+    cached = _method_list_cache.get(id(ground_truth))
+    if cached is not None and cached[0] is ground_truth:
+        return cached[1]
+    
     methods = []
     for category, method_list in ground_truth["framework_methods"].items():
         for method_data in method_list:
@@ -127,26 +368,8 @@ def get_method_list(ground_truth: Dict) -> list:
                 "category": category,
                 "data": method_data
             })
-    return methods
-
-def create_progress_summary(results: Dict, total_methods: int) -> Dict:
-    """Create summary of evaluation progress"""
-    completed = len(results)
-    successful_evaluations = 0
-    failed_evaluations = 0
     
-    for method_result in results.values():
-        for llm_result in method_result.get("llm_responses", {}).values():
-            if llm_result.get("success", False):
-                successful_evaluations += 1
-            else:
-                failed_evaluations += 1
-    
-    return {
-        "completed_methods": completed,
-        "total_methods": total_methods,
-        "progress_percentage": (completed / total_methods) * 100,
-        "successful_evaluations": successful_evaluations,
-        "failed_evaluations": failed_evaluations,
-        "total_evaluations": successful_evaluations + failed_evaluations
-    }
+    if len(_method_list_cache) >= _METHOD_LIST_CACHE_SIZE:
+        _method_list_cache.clear()
+    _method_list_cache[id(ground_truth)] = (ground_truth, methods)
+    return methods
@@ -6,9 +6,31 @@ Script to clean results folders - keeps only dangerous_apis_found.json
 import os
 import sys
 import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
+def _fast_rmtree(path):
+    """Remove a directory tree, delegating to rm -rf on POSIX"""
+    if os.name == "posix":
+        subprocess.run(["rm", "-rf", "--", path], check=True)
+    else:
+        shutil.rmtree(path)
+
+
+def _delete_one(entry):
+    """Delete a scanned file or folder; returns the error message on failure"""
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            _fast_rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+    except Exception as e:
+        return f"Error deleting {entry.path}: {e}"
+    return None
+
+
 def cleanup_results(results_dir):
     """Clean results directory, keeping only dangerous_apis_found.json in each subfolder"""
     
@@ -26,7 +48,7 @@ def cleanup_results(results_dir):
     print()
     
     # Get all subfolders
-    subfolders = [f for f in results_path.iterdir() if f.is_dir()]
+    subfolders = [entry for entry in os.scandir(results_path) if entry.is_dir()]
     print(f"Found {len(subfolders)} subfolders")
     print()
     
@@ -38,29 +60,26 @@ def cleanup_results(results_dir):
     total_to_delete = 0
     folders_with_target = 0
     folders_without_target = 0
-    items_to_delete = []
+    to_delete_per_folder = []  # (subfolder, entries to delete), reused by the delete phase
     
     for subfolder in subfolders:
-        target_file = subfolder / "dangerous_apis_found.json"
+        entries = list(os.scandir(subfolder))
+        names = {entry.name for entry in entries}
         
-        if target_file.exists():
+        if "dangerous_apis_found.json" in names:
             folders_with_target += 1
-            
-            # List items to delete
-            for item in subfolder.iterdir():
-                if item.name != "dangerous_apis_found.json":
-                    print(f"  ❌ {subfolder.name}/{item.name}")
-                    items_to_delete.append(item)
-                    total_to_delete += 1
+            items = [entry for entry in entries if entry.name != "dangerous_apis_found.json"]
         else:
             folders_without_target += 1
             print(f"  ⚠️  WARNING: {subfolder.name}/ does NOT contain dangerous_apis_found.json")
             print(f"     (All contents will be deleted)")
-            
-            for item in subfolder.iterdir():
-                print(f"  ❌ {subfolder.name}/{item.name}")
-                items_to_delete.append(item)
-                total_to_delete += 1
+            items = entries
+        
+        # List items to delete
+        for entry in items:
+            print(f"  ❌ {subfolder.name}/{entry.name}")
+        to_delete_per_folder.append((subfolder, items))
+        total_to_delete += len(items)
     
     print()
     print("=" * 50)
@@ -84,25 +103,18 @@ def cleanup_results(results_dir):
     print("Starting cleanup...")
     print("=" * 50)
     
-    deleted_count = 0
-    kept_count = 0
+    kept_count = folders_with_target
     
-    for subfolder in subfolders:
-        # Delete everything except dangerous_apis_found.json
-        for item in subfolder.iterdir():
-            if item.name != "dangerous_apis_found.json":
-                try:
-                    if item.is_dir():
-                        shutil.rmtree(item)
-                    else:
-                        item.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"  ❌ Error deleting {item}: {e}")
-            else:
-                kept_count += 1
-        
+    # Deletion is I/O bound, so spread it over a thread pool
+    all_items = [entry for _, items in to_delete_per_folder for entry in items]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        errors = [error for error in executor.map(_delete_one, all_items) if error]
+    
+    for error in errors:
+        print(f"  ❌ {error}")
+    for subfolder, _ in to_delete_per_folder:
         print(f"  ✓ Cleaned: {subfolder.name}/")
+    deleted_count = len(all_items) - len(errors)
     
     print()
     print("=" * 50)
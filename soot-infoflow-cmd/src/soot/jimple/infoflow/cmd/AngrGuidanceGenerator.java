@@ -0,0 +1,342 @@
+package soot.jimple.infoflow.cmd;
+
+import java.io.File;
+import java.io.FileWriter;
+import java.io.IOException;
+import java.util.*;
+
+/**
+ * Writes composite paths as angr guidance: a per-app Python module backed by a
+ * shared schema module and a compact JSON path table
+ */
+public class AngrGuidanceGenerator {
+
+    private final List<CompositePathBuilder.CompositePath> compositePaths;
+
+    // Method names in order of first appearance, referenced by index from the path table
+    private final List<String> methodNames;
+    private final Map<String, Integer> methodIds;
+
+    // Distinct (method, blocks, entry_block, exit_block) records shared between paths
+    private final List<List<Integer>> methodExecs;
+    private final Map<List<Integer>, Integer> methodExecIds;
+
+    public AngrGuidanceGenerator(List<CompositePathBuilder.CompositePath> compositePaths) {
+        this.compositePaths = compositePaths;
+        this.methodNames = new ArrayList<>();
+        this.methodIds = new HashMap<>();
+        this.methodExecs = new ArrayList<>();
+        this.methodExecIds = new HashMap<>();
+    }
+
+    /**
+     * Generate the guidance module for all composite paths. Next to the module
+     * this writes the shared guidance_schema.py loader and the path data as
+     * data/<module>.json.
+     */
+    public void generateGuidanceFile(String outputFile) {
+        File moduleFile = new File(outputFile);
+        File outputDir = moduleFile.getAbsoluteFile().getParentFile();
+        String appName = moduleFile.getName().endsWith(".py")
+                ? moduleFile.getName().substring(0, moduleFile.getName().length() - 3)
+                : moduleFile.getName();
+
+        File dataDir = new File(outputDir, "data");
+        File dataFile = new File(dataDir, appName + ".json");
+        File schemaFile = new File(outputDir, "guidance_schema.py");
+
+        try {
+            dataDir.mkdirs();
+            try (FileWriter writer = new FileWriter(dataFile)) {
+                writer.write(generateDataContent());
+            }
+            try (FileWriter writer = new FileWriter(schemaFile)) {
+                writer.write(generateSchemaContent());
+            }
+            try (FileWriter writer = new FileWriter(moduleFile)) {
+                writer.write(generateModuleContent(appName));
+            }
+            System.out.println("Angr guidance written to: " + outputFile + " (data: " + dataFile + ")");
+
+        } catch (IOException e) {
+            System.err.println("Error writing Angr guidance: " + e.getMessage());
+        }
+    }
+
+    /**
+     * Generate JSON data content with method names, the EXECS pool and the path trie
+     */
+    private String generateDataContent() {
+        TrieNode root = new TrieNode(-1);
+        Set<Integer> entryIds = new LinkedHashSet<>();
+        for (int i = 0; i < compositePaths.size(); i++) {
+            CompositePathBuilder.CompositePath path = compositePaths.get(i);
+            entryIds.add(getMethodId(path.getEntryPoint().getName()));
+
+            TrieNode node = root;
+            for (CompositePathBuilder.CompositePath.MethodExecution execution : path.getMethodExecutions()) {
+                node = node.getChild(getMethodExecId(execution.methodPath));
+            }
+            node.pathIds.add(i);
+        }
+
+        List<String> methods = new ArrayList<>();
+        for (String methodName : methodNames) {
+            methods.add("\"" + methodName + "\"");
+        }
+
+        List<String> execs = new ArrayList<>();
+        for (List<Integer> exec : methodExecs) {
+            execs.add(exec.toString());
+        }
+
+        StringBuilder content = new StringBuilder();
+        content.append("{\n");
+        content.append("  \"methods\": [").append(String.join(", ", methods)).append("],\n");
+        content.append("  \"entry_points\": ").append(entryIds).append(",\n");
+        content.append("  \"execs\": [").append(String.join(", ", execs)).append("],\n");
+        content.append("  \"trie\": ").append(root.childrenToJson()).append("\n");
+        content.append("}\n");
+        return content.toString();
+    }
+
+    /**
+     * Generate the shared guidance_schema.py module that loads and indexes the path data
+     */
+    private String generateSchemaContent() {
+        StringBuilder content = new StringBuilder();
+        content.append("# Angr Symbolic Execution Guidance Schema\n");
+        content.append("# Generated from App-Level CFG Analysis\n\n");
+        content.append("import array\n");
+        content.append("import collections\n");
+        content.append("import json\n");
+        content.append("import itertools\n");
+        content.append("import os\n");
+        content.append("import sys\n");
+        content.append("from typing import NamedTuple\n\n");
+        content.append("DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')\n\n\n");
+        content.append("class MethodExec(NamedTuple):\n");
+        content.append("    method: str\n");
+        content.append("    blocks: int\n");
+        content.append("    start: int\n");
+        content.append("    end: int\n\n");
+        content.append("    @property\n");
+        content.append("    def path_summary(self):\n");
+        content.append("        return f'{self.method}: block_{self.start} -> block_{self.end} ({self.blocks} blocks)'\n\n\n");
+        content.append("class PathRecord(NamedTuple):\n");
+        content.append("    entry_point: str\n");
+        content.append("    method_executions: tuple\n");
+        content.append("    total_blocks: int\n\n");
+        content.append("    @property\n");
+        content.append("    def method_chain(self):\n");
+        content.append("        return tuple(me.method for me in self.method_executions)\n\n\n");
+        content.append("def _walk(nodes, prefix):\n");
+        content.append("    for exec_id, path_ids, children in nodes:\n");
+        content.append("        chain = prefix + (exec_id,)\n");
+        content.append("        for i in path_ids:\n");
+        content.append("            yield i, chain\n");
+        content.append("        yield from _walk(children, chain)\n\n\n");
+        content.append("class Guidance:\n");
+        content.append("    \"\"\"Guidance paths of one app, loaded from data/<app_name>.json\"\"\"\n\n");
+        content.append("    def __init__(self, data):\n");
+        content.append("        self.methods = tuple(map(sys.intern, data['methods']))\n");
+        content.append("        self.entry_points = {self.methods[i]: i for i in data['entry_points']}\n");
+        content.append("        # Shared pool of method executions, referenced by every path running them\n");
+        content.append("        self.execs = tuple(MethodExec(self.methods[m], b, s, e) for m, b, s, e in data['execs'])\n");
+        content.append("        # Paths are stored as a prefix tree of [exec, path_ids, children] nodes, so a\n");
+        content.append("        # prefix shared by many paths (e.g. onClick -> handleAdmin) is stored once\n");
+        content.append("        self.trie = data['trie']\n\n");
+        content.append("        found = dict(_walk(self.trie, ()))\n");
+        content.append("        chains = [found[i] for i in range(len(found))]\n");
+        content.append("        self.paths = tuple(self._build_record(chain) for chain in chains)\n");
+        content.append("        self.total_blocks = tuple(path.total_blocks for path in self.paths)\n\n");
+        content.append("        # method chain -> indices of paths following it\n");
+        content.append("        index = collections.defaultdict(list)\n");
+        content.append("        for i, path in enumerate(self.paths):\n");
+        content.append("            index[path.method_chain].append(i)\n");
+        content.append("        self.index = {chain: tuple(ids) for chain, ids in index.items()}\n\n");
+        content.append("        self.unique_paths = self._find_unique_paths()\n");
+        content.append("        self.ordered = self._order_paths(chains)\n\n");
+        content.append("        # (blocks << 16) | exit_block of every execution of every path, stored\n");
+        content.append("        # contiguously; path i occupies packed[offsets[i]:offsets[i + 1]]. The exit\n");
+        content.append("        # block is masked to 16 bits so an unknown exit (-1) packs instead of overflowing\n");
+        content.append("        self.packed = array.array('I', (\n");
+        content.append("            (me.blocks << 16) | (me.end & 0xFFFF) for path in self.paths for me in path.method_executions))\n");
+        content.append("        self.offsets = array.array('I', itertools.accumulate(\n");
+        content.append("            (len(path.method_executions) for path in self.paths), initial=0))\n\n");
+        content.append("    def _build_record(self, chain):\n");
+        content.append("        executions = tuple(self.execs[j] for j in chain)\n");
+        content.append("        return PathRecord(executions[0].method, executions, sum(me.blocks for me in executions))\n\n");
+        content.append("    def _find_unique_paths(self):\n");
+        content.append("        # Paths with the same (method, exit block) sequence lead angr to the same path\n");
+        content.append("        # predicates, so only the first index of each is kept for exploration\n");
+        content.append("        seen = set()\n");
+        content.append("        unique = []\n");
+        content.append("        for i, path in enumerate(self.paths):\n");
+        content.append("            key = tuple((me.method, me.end) for me in path.method_executions)\n");
+        content.append("            if key not in seen:\n");
+        content.append("                seen.add(key)\n");
+        content.append("                unique.append(i)\n");
+        content.append("        return tuple(unique)\n\n");
+        content.append("    def _order_paths(self, chains):\n");
+        content.append("        # Shortest paths first; among equals, deeper shared prefixes first so their\n");
+        content.append("        # common state is explored back to back\n");
+        content.append("        prefix_counts = collections.Counter(\n");
+        content.append("            chain[:d] for chain in chains for d in range(1, len(chain) + 1))\n\n");
+        content.append("        def prefix_depth(i):\n");
+        content.append("            chain = chains[i]\n");
+        content.append("            return sum(1 for d in range(1, len(chain) + 1) if prefix_counts[chain[:d]] > 1)\n\n");
+        content.append("        return tuple(sorted(range(len(self.paths)), key=lambda i: (self.total_blocks[i], -prefix_depth(i))))\n\n");
+        content.append("    def paths_for(self, chain):\n");
+        content.append("        \"\"\"Indices of paths whose method chain is exactly `chain`, e.g. ('onClick', 'handleGuest').\"\"\"\n");
+        content.append("        return self.index.get(tuple(chain), ())\n\n");
+        content.append("    def paths_with_prefix(self, chain):\n");
+        content.append("        \"\"\"Indices of paths whose method chain starts with `chain`.\"\"\"\n");
+        content.append("        matched = nodes = self.trie\n");
+        content.append("        for method in chain:\n");
+        content.append("            matched = [node for node in nodes if self.execs[node[0]].method == method]\n");
+        content.append("            nodes = [child for node in matched for child in node[2]]\n");
+        content.append("        return tuple(sorted(i for i, _ in _walk(matched, ())))\n\n");
+        content.append("    def paths_with_exit(self, position, block):\n");
+        content.append("        \"\"\"Indices of paths whose execution at `position` ends at block_<block>.\"\"\"\n");
+        content.append("        packed, offsets = self.packed, self.offsets\n");
+        content.append("        block &= 0xFFFF\n");
+        content.append("        return tuple(\n");
+        content.append("            i for i in range(len(self.paths))\n");
+        content.append("            if offsets[i] + position < offsets[i + 1] and packed[offsets[i] + position] & 0xFFFF == block)\n\n");
+        content.append("    def iter_paths_shortest_first(self, unique=True):\n");
+        content.append("        \"\"\"Yield path indices in ascending total_blocks order, skipping duplicates if `unique`.\"\"\"\n");
+        content.append("        unique_paths = set(self.unique_paths)\n");
+        content.append("        for i in self.ordered:\n");
+        content.append("            if not unique or i in unique_paths:\n");
+        content.append("                yield i\n\n");
+        content.append("    def get_path(self, i):\n");
+        content.append("        \"\"\"Rebuild the dict for path i (path_<i + 1>); executions are MethodExec records.\"\"\"\n");
+        content.append("        path = self.paths[i]\n");
+        content.append("        return {\n");
+        content.append("            'entry_point': path.entry_point,\n");
+        content.append("            'method_executions': list(path.method_executions),\n");
+        content.append("            'total_blocks': path.total_blocks,\n");
+        content.append("        }\n\n\n");
+        content.append("def load_guidance(app_name):\n");
+        content.append("    \"\"\"Load the guidance generated for `app_name` from the data directory.\"\"\"\n");
+        content.append("    with open(os.path.join(DATA_DIR, app_name + '.json'), 'rb') as f:\n");
+        content.append("        return Guidance(json.load(f))\n");
+
+        return content.toString();
+    }
+
+    /**
+     * Generate the per-app guidance module, a thin wrapper over guidance_schema
+     * that only loads the data when one of its attributes is first accessed
+     */
+    private String generateModuleContent(String appName) {
+        StringBuilder content = new StringBuilder();
+        content.append("# Angr Symbolic Execution Guidance\n");
+        content.append("# Generated from App-Level CFG Analysis\n\n");
+        content.append("import functools\n\n");
+        content.append("from guidance_schema import load_guidance\n\n");
+        content.append("APP_NAME = '").append(appName).append("'\n\n");
+        content.append("# Module attribute -> Guidance attribute, resolved when first accessed\n");
+        content.append("_EXPORTS = {\n");
+        content.append("    'METHODS': 'methods',\n");
+        content.append("    'ENTRY_POINTS': 'entry_points',\n");
+        content.append("    'EXECS': 'execs',\n");
+        content.append("    'TRIE': 'trie',\n");
+        content.append("    'PATHS': 'paths',\n");
+        content.append("    'TOTAL_BLOCKS': 'total_blocks',\n");
+        content.append("    'INDEX': 'index',\n");
+        content.append("    'UNIQUE_PATHS': 'unique_paths',\n");
+        content.append("    'ORDERED': 'ordered',\n");
+        content.append("    'PACKED': 'packed',\n");
+        content.append("    'OFFSETS': 'offsets',\n");
+        content.append("    'paths_for': 'paths_for',\n");
+        content.append("    'paths_with_prefix': 'paths_with_prefix',\n");
+        content.append("    'paths_with_exit': 'paths_with_exit',\n");
+        content.append("    'iter_paths_shortest_first': 'iter_paths_shortest_first',\n");
+        content.append("    'get_path': 'get_path',\n");
+        content.append("}\n\n\n");
+        content.append("@functools.lru_cache(maxsize=None)\n");
+        content.append("def _guidance():\n");
+        content.append("    return load_guidance(APP_NAME)\n\n\n");
+        content.append("@functools.lru_cache(maxsize=None)\n");
+        content.append("def _build_path(i):\n");
+        content.append("    return _guidance().get_path(i)\n\n\n");
+        content.append("def total_blocks(i):\n");
+        content.append("    \"\"\"Total number of blocks along PATHS[i].\"\"\"\n");
+        content.append("    return _guidance().total_blocks[i]\n\n\n");
+        content.append("def __getattr__(name):\n");
+        content.append("    if name in _EXPORTS:\n");
+        content.append("        return getattr(_guidance(), _EXPORTS[name])\n");
+        content.append("    # path_<n> names of the original module, built on first access\n");
+        content.append("    if name.startswith('path_') and name[5:].isdigit():\n");
+        content.append("        i = int(name[5:]) - 1\n");
+        content.append("        if 0 <= i < len(_guidance().paths):\n");
+        content.append("            return _build_path(i)\n");
+        content.append("    raise AttributeError(f\"module {__name__!r} has no attribute {name!r}\")\n\n\n");
+        content.append("def __dir__():\n");
+        content.append("    path_names = [f'path_{i + 1}' for i in range(len(_guidance().paths))]\n");
+        content.append("    return sorted([*globals(), *_EXPORTS, *path_names])\n");
+
+        return content.toString();
+    }
+
+    /**
+     * Get index of a method execution in the EXECS pool, registering it on first use
+     */
+    private int getMethodExecId(MethodPathEnumerator.MethodPath methodPath) {
+        List<Integer> exec = Arrays.asList(
+                getMethodId(methodPath.method.getName()),
+                methodPath.getLength(),
+                methodPath.getEntryBlockIndex(),
+                methodPath.getExitBlockIndex());
+
+        Integer id = methodExecIds.get(exec);
+        if (id == null) {
+            id = methodExecs.size();
+            methodExecs.add(exec);
+            methodExecIds.put(exec, id);
+        }
+        return id;
+    }
+
+    /**
+     * Get index of a method name in the METHODS table, registering it on first use
+     */
+    private int getMethodId(String methodName) {
+        Integer id = methodIds.get(methodName);
+        if (id == null) {
+            id = methodNames.size();
+            methodNames.add(methodName);
+            methodIds.put(methodName, id);
+        }
+        return id;
+    }
+
+    /**
+     * Node of the path prefix tree, keyed by EXECS index
+     */
+    private static class TrieNode {
+        final int execId;
+        final List<Integer> pathIds;
+        final Map<Integer, TrieNode> children;
+
+        TrieNode(int execId) {
+            this.execId = execId;
+            this.pathIds = new ArrayList<>();
+            this.children = new LinkedHashMap<>();
+        }
+
+        TrieNode getChild(int childExecId) {
+            return children.computeIfAbsent(childExecId, TrieNode::new);
+        }
+
+        String childrenToJson() {
+            List<String> nodes = new ArrayList<>();
+            for (TrieNode child : children.values()) {
+                nodes.add("[" + child.execId + ", " + child.pathIds + ", " + child.childrenToJson() + "]");
+            }
+            return "[" + String.join(", ", nodes) + "]";
+        }
+    }
+}
@@ -510,36 +510,8 @@ public class AppLevelCFGBuilder {
     public void generateAngrGuidance(List<CompositePathBuilder.CompositePath> compositePaths, String outputFile) {
         System.out.println("\n=== Generating Angr Guidance ===");
 
-        try (java.io.FileWriter writer = new java.io.FileWriter(outputFile)) {
-            writer.write("# Angr Symbolic Execution Guidance\n");
-            writer.write("# Generated from App-Level CFG Analysis\n\n");
-
-            for (CompositePathBuilder.CompositePath path : compositePaths) {
-                writer.write("## Composite Path " + path.getPathId() + "\n");
-                writer.write("# Entry: " + path.getEntryPoint().getName() + "\n");
-                writer.write("# Summary: " + path.getPathSummary() + "\n");
-
-                writer.write("path_" + path.getPathId() + " = {\n");
-                writer.write("    'entry_point': '" + path.getEntryPoint().getName() + "',\n");
-                writer.write("    'method_executions': [\n");
-
-                for (CompositePathBuilder.CompositePath.MethodExecution execution : path.getMethodExecutions()) {
-                    writer.write("        {\n");
-                    writer.write("            'method': '" + execution.methodPath.method.getName() + "',\n");
-                    writer.write("            'blocks': " + execution.methodPath.blockSequence.size() + ",\n");
-                    writer.write("            'path_summary': '" + execution.methodPath.getPathSummary() + "'\n");
-                    writer.write("        },\n");
-                }
-
-                writer.write("    ]\n");
-                writer.write("}\n\n");
-            }
-
-            System.out.println("Angr guidance written to: " + outputFile);
-
-        } catch (java.io.IOException e) {
-            System.err.println("Error writing Angr guidance: " + e.getMessage());
-        }
+        AngrGuidanceGenerator generator = new AngrGuidanceGenerator(compositePaths);
+        generator.generateGuidanceFile(outputFile);
     }
 
     /**
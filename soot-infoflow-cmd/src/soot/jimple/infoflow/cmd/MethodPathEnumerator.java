@@ -128,9 +128,10 @@ public class MethodPathEnumerator {
      * Extract block index from block ID
      */
     private int extractBlockIndex(String blockId) {
-        String[] parts = blockId.split("_block_");
-        if (parts.length == 2) {
-            return Integer.parseInt(parts[1]);
+        // The signature itself may contain "_block_" (e.g. read_block_data), so split at the last one
+        int separator = blockId.lastIndexOf("_block_");
+        if (separator >= 0) {
+            return Integer.parseInt(blockId.substring(separator + "_block_".length()));
         }
         return -1;
     }
@@ -161,6 +162,20 @@ public class MethodPathEnumerator {
             return blockSequence.isEmpty() ? null : blockSequence.get(blockSequence.size() - 1);
         }
 
+        /**
+         * Get the soot block index of the entry block
+         */
+        public int getEntryBlockIndex() {
+            return extractBlockIndex(getEntryBlock());
+        }
+
+        /**
+         * Get the soot block index of the exit block
+         */
+        public int getExitBlockIndex() {
+            return extractBlockIndex(getExitBlock());
+        }
+
         /**
          * Get path length
          */
@@ -184,8 +199,8 @@ public class MethodPathEnumerator {
             }
 
             String methodName = method.getName();
-            int entryIndex = extractBlockIndex(getEntryBlock());
-            int exitIndex = extractBlockIndex(getExitBlock());
+            int entryIndex = getEntryBlockIndex();
+            int exitIndex = getExitBlockIndex();
 
             return methodName + ": block_" + entryIndex + " -> block_" + exitIndex +
                     " (" + blockSequence.size() + " blocks)";
@@ -197,9 +212,9 @@ public class MethodPathEnumerator {
         private int extractBlockIndex(String blockId) {
             if (blockId == null)
                 return -1;
-            String[] parts = blockId.split("_block_");
-            if (parts.length == 2) {
-                return Integer.parseInt(parts[1]);
+            int separator = blockId.lastIndexOf("_block_");
+            if (separator >= 0) {
+                return Integer.parseInt(blockId.substring(separator + "_block_".length()));
             }
             return -1;
         }